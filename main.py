@@ -1,10 +1,16 @@
-import json
+import asyncio
+import logging
 import os
-from fastapi import FastAPI, HTTPException
+import sys
+import orjson
+from fastapi import FastAPI, HTTPException, Response
+from fastapi.responses import ORJSONResponse
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Set, Tuple
 
-app = FastAPI()
+# Las respuestas se serializan con orjson, igual que data.json y el journal
+app = FastAPI(default_response_class=ORJSONResponse)
+logger = logging.getLogger(__name__)
 
 # Constantes para las claves del JSON
 STATUS = "status"
@@ -16,46 +22,360 @@ STATUS_REGISTRADO = "REGISTRADO"
 STATUS_PAGADO = "PAGADO"
 STATUS_FALLIDO = "FALLIDO"
 
+# Constantes para los medios de pago. Se internan para que todos los pagos
+# compartan el mismo objeto string y las comparaciones resuelvan por identidad.
+PAYMENT_METHOD_CREDIT_CARD = sys.intern("Tarjeta de Crédito")
+PAYMENT_METHOD_PAYPAL = sys.intern("PayPal")
+
 # Path del archivo de datos
 DATA_PATH = "data.json"
+# Path del journal (append-only) con las escrituras posteriores a la última compactación
+JOURNAL_PATH = "data.jsonl"
+# Cantidad de escrituras en el journal antes de reescribir data.json
+COMPACT_EVERY = 100
+# Tamaño del buffer del journal y cada cuántos segundos se baja a disco
+JOURNAL_BUFFER_SIZE = 1 << 16
+JOURNAL_FLUSH_INTERVAL = 0.1
+# Máximo de escrituras agrupadas en un solo write y cuánto se espera para juntarlas
+JOURNAL_BATCH_SIZE = 256
+JOURNAL_BATCH_WAIT = 0.005
+# Segundos entre reintentos cuando falla la escritura a disco
+JOURNAL_RETRY_INTERVAL = 1.0
+
+# Store en memoria: data.json se lee una sola vez al iniciar la aplicación
+_PAYMENTS: Dict[str, Dict[str, Any]] = {}
+# Índice secundario: (medio de pago, estado) -> IDs de los pagos
+_BY_METHOD_STATUS: Dict[Tuple[str, str], Set[str]] = {}
+# Clave bajo la que está indexado cada pago, para sacarlo en O(1) al actualizarlo
+_INDEX_KEYS: Dict[str, Tuple[str, str]] = {}
+# Respuesta de GET /payments ya serializada; se invalida en cada escritura
+_payments_json_cache: Optional[bytes] = None
+# Cada pago ya serializado para GET /payments/{payment_id}; se invalida al escribirlo
+_payment_json_cache: Dict[str, bytes] = {}
+_journal = None
+_journal_writes = 0
+# Hay escrituras en el journal que todavía no se bajaron a disco
+_journal_dirty = False
+# Escrituras que todavía no llegaron al journal, en orden, y el aviso a la
+# tarea escritora. Se sacan de la lista recién cuando están en el journal.
+_pending_writes: List[Tuple[str, Dict[str, Any]]] = []
+_pending_event = None
+_writer_task = None
+_flush_task = None
 
 
 def initialize_data_file():
     """
     Asegura que el archivo data.json exista antes de intentar leerlo.
-    Si no existe, lo crea con un diccionario vacío.
+    Si no existe o está vacío, lo crea con un diccionario vacío.
     """
-    if not os.path.exists(DATA_PATH):
-        with open(DATA_PATH, "w") as f:
-            json.dump({}, f)
+    if not os.path.exists(DATA_PATH) or os.path.getsize(DATA_PATH) == 0:
+        with open(DATA_PATH, "wb") as f:
+            f.write(orjson.dumps({}))
 
 
-def load_all_payments() -> Dict[str, Any]:
-    """Carga todos los pagos desde el archivo JSON."""
-    with open(DATA_PATH, "r") as f:
-        data = json.load(f)
+def read_data_file() -> Dict[str, Any]:
+    """Lee el snapshot completo de pagos desde el archivo JSON."""
+    with open(DATA_PATH, "rb") as f:
+        data = orjson.loads(f.read())
     return data
 
 
 def save_all_payments(data: Dict[str, Any]):
-    """Guarda el diccionario completo de pagos en el JSON."""
-    with open(DATA_PATH, "w") as f:
-        json.dump(data, f, indent=4)
+    """
+    Guarda el diccionario completo de pagos en el JSON.
+    Se escribe en un archivo temporal que se baja a disco y se reemplaza,
+    para no dejar un data.json a medio escribir si el proceso se corta.
+    Al retornar, el nuevo data.json ya está en disco.
+    """
+    tmp_path = DATA_PATH + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, DATA_PATH)
+    fsync_directory(os.path.dirname(os.path.abspath(DATA_PATH)))
+
+
+def fsync_directory(path: str):
+    """
+    Baja a disco la entrada de directorio, para que el os.replace sobreviva
+    a un corte de luz. En Windows no se pueden abrir directorios, se omite.
+    """
+    if os.name == "nt":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def replay_journal() -> int:
+    """
+    Reaplica sobre el store en memoria las escrituras registradas en el journal.
+    Retorna la cantidad de escrituras reaplicadas.
+    """
+    if not os.path.exists(JOURNAL_PATH):
+        return 0
+
+    replayed = 0
+    with open(JOURNAL_PATH, "rb") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = orjson.loads(line)
+            except orjson.JSONDecodeError:
+                # Línea incompleta: el proceso se cortó o falló a mitad de una
+                # escritura. Se saltea; compact() siempre escribe sus líneas
+                # en una línea nueva, así que las siguientes siguen siendo válidas.
+                continue
+            _PAYMENTS[record["id"]] = record["data"]
+            replayed += 1
+    return replayed
+
+
+def serialize_journal_records(records: List[Tuple[str, Dict[str, Any]]]) -> bytes:
+    """Serializa escrituras como líneas del journal."""
+    return b"".join(
+        orjson.dumps({"id": payment_id, "data": data}) + b"\n"
+        for payment_id, data in records
+    )
+
+
+def compact():
+    """
+    Reescribe data.json con el estado en memoria y vacía el journal.
+
+    Antes del snapshot se escriben y bajan a disco las escrituras pendientes,
+    así la última línea del journal de cada pago coincide con data.json y,
+    si el proceso se corta antes de truncarlo, reaplicarlo no cambia nada.
+    El journal se trunca recién cuando el nuevo data.json está en disco.
+    """
+    global _journal, _journal_writes, _journal_dirty
+    if _journal is None:
+        _journal = open(JOURNAL_PATH, "ab", buffering=JOURNAL_BUFFER_SIZE)
+    if _pending_writes:
+        # El salto de línea inicial separa estas líneas de una escritura
+        # anterior que haya quedado incompleta
+        _journal.write(b"\n" + serialize_journal_records(_pending_writes))
+        _pending_writes.clear()
+    flush_journal()
+
+    save_all_payments(_PAYMENTS)
+
+    try:
+        _journal.close()
+    finally:
+        # Aunque el close falle, que no quede referenciado un archivo cerrado
+        _journal = None
+    _journal = open(JOURNAL_PATH, "wb", buffering=JOURNAL_BUFFER_SIZE)
+    os.fsync(_journal.fileno())
+    _journal_writes = 0
+    _journal_dirty = False
+
+
+def intern_payment(data: Dict[str, Any]):
+    """
+    Interna el medio de pago y el estado de un pago, así los pagos con el
+    mismo valor comparten un único string.
+    """
+    data[PAYMENT_METHOD] = sys.intern(data[PAYMENT_METHOD])
+    data[STATUS] = sys.intern(data[STATUS])
+
+
+def index_payment(payment_id: str, data: Dict[str, Any]):
+    """
+    Actualiza el índice de pagos por medio de pago y estado.
+    """
+    key = (data[PAYMENT_METHOD], data[STATUS])
+    old_key = _INDEX_KEYS.get(payment_id)
+    if old_key == key:
+        return
+    if old_key is not None:
+        old_ids = _BY_METHOD_STATUS[old_key]
+        old_ids.discard(payment_id)
+        # payment_method es libre: no se dejan claves vacías acumulándose
+        if not old_ids:
+            del _BY_METHOD_STATUS[old_key]
+    _BY_METHOD_STATUS.setdefault(key, set()).add(payment_id)
+    _INDEX_KEYS[payment_id] = key
+
+
+def rebuild_index():
+    """Interna los pagos cargados y reconstruye el índice desde el store en memoria."""
+    _BY_METHOD_STATUS.clear()
+    _INDEX_KEYS.clear()
+    for payment_id, data in _PAYMENTS.items():
+        intern_payment(data)
+        index_payment(payment_id, data)
+
+
+def count_registered_in_store(payment_method: str) -> int:
+    """
+    Cuenta los pagos del store en memoria en estado REGISTRADO con el medio
+    de pago indicado, usando el índice.
+    """
+    return len(_BY_METHOD_STATUS.get((payment_method, STATUS_REGISTRADO), ()))
+
+
+def count_registered(payment_method: str, all_payments: Dict[str, Any],
+                     stop_at: Optional[int] = None) -> int:
+    """
+    Cuenta los pagos de all_payments en estado REGISTRADO con el medio de
+    pago indicado, recorriéndolos uno por uno. Corta el recorrido al llegar
+    a stop_at si se indica.
+    """
+    count = 0
+    for payment in all_payments.values():
+        if (payment[PAYMENT_METHOD] == payment_method and
+                payment[STATUS] == STATUS_REGISTRADO):
+            count += 1
+            if count == stop_at:
+                break
+    return count
+
+
+def open_store():
+    """
+    Carga data.json en memoria y reaplica el journal de la ejecución anterior.
+    """
+    global _journal, _journal_writes, _payments_json_cache
+    initialize_data_file()
+    _payments_json_cache = None
+    _payment_json_cache.clear()
+    _pending_writes.clear()
+    _PAYMENTS.clear()
+    _PAYMENTS.update(read_data_file())
+
+    # Si el journal tiene contenido (aunque sea solo una línea incompleta) se
+    # compacta, para que las escrituras nuevas no queden pegadas a esos bytes
+    replay_journal()
+    if os.path.exists(JOURNAL_PATH) and os.path.getsize(JOURNAL_PATH) > 0:
+        compact()
+    else:
+        _journal = open(JOURNAL_PATH, "ab", buffering=JOURNAL_BUFFER_SIZE)
+        _journal_writes = 0
+    rebuild_index()
+
+
+def flush_journal():
+    """Baja a disco las escrituras que quedaron en el buffer del journal."""
+    global _journal_dirty
+    if _journal is not None:
+        _journal.flush()
+        os.fsync(_journal.fileno())
+    _journal_dirty = False
+
+
+def write_journal_batch():
+    """
+    Agrega al journal, con un solo write, hasta JOURNAL_BATCH_SIZE escrituras
+    pendientes. data.json solo se reescribe cada COMPACT_EVERY escrituras.
+    """
+    global _journal_writes, _journal_dirty
+    batch = _pending_writes[:JOURNAL_BATCH_SIZE]
+    if not batch:
+        # compact() ya las escribió
+        return
+    _journal.write(serialize_journal_records(batch))
+    del _pending_writes[:len(batch)]
+    _journal_dirty = True
+
+    _journal_writes += len(batch)
+    if _journal_writes >= COMPACT_EVERY:
+        compact()
+
+
+async def compact_until_success():
+    """
+    Reintenta la compactación cada JOURNAL_RETRY_INTERVAL segundos hasta que
+    funcione. Las escrituras que no llegaron al journal siguen pendientes y
+    compact() las escribe antes del snapshot.
+    """
+    while True:
+        await asyncio.sleep(JOURNAL_RETRY_INTERVAL)
+        try:
+            compact()
+            return
+        except Exception:
+            logger.exception("No se pudo compactar el journal, se reintenta")
+
+
+async def journal_writer():
+    """
+    Tarea de fondo: única escritora del journal. Junta las escrituras que
+    llegan dentro de JOURNAL_BATCH_WAIT segundos (hasta JOURNAL_BATCH_SIZE)
+    y las escribe juntas. Si la escritura falla (disco lleno, permisos), no
+    se detiene: reintenta compactando hasta que el disco vuelva a responder.
+    """
+    while True:
+        await _pending_event.wait()
+        await asyncio.sleep(JOURNAL_BATCH_WAIT)
+
+        try:
+            write_journal_batch()
+        except Exception:
+            logger.exception("No se pudo escribir el journal, se reintenta compactando")
+            await compact_until_success()
+
+        if not _pending_writes:
+            _pending_event.clear()
+
+
+async def flush_journal_periodically():
+    """
+    Tarea de fondo: hace flush + fsync del journal cada JOURNAL_FLUSH_INTERVAL
+    segundos, en lugar de hacerlo en cada request. Si no hubo escrituras
+    desde el último fsync, no hace nada.
+    """
+    while True:
+        await asyncio.sleep(JOURNAL_FLUSH_INTERVAL)
+        if _journal_dirty:
+            try:
+                flush_journal()
+            except Exception:
+                # Queda marcado como pendiente y se reintenta en el próximo ciclo
+                logger.exception("No se pudo bajar el journal a disco")
+
+
+def close_store():
+    """Compacta el journal en data.json y cierra el archivo."""
+    global _journal
+    compact()
+    try:
+        _journal.close()
+    finally:
+        _journal = None
+
+
+def load_all_payments() -> Dict[str, Any]:
+    """Retorna todos los pagos del store en memoria."""
+    return _PAYMENTS
 
 
 def load_payment(payment_id: str) -> Dict[str, Any]:
     """Carga un pago específico por su ID."""
-    all_payments = load_all_payments()
-    if payment_id not in all_payments:
+    payment = _PAYMENTS.get(payment_id)
+    if payment is None:
         raise HTTPException(status_code=404, detail="Payment not found")
-    return all_payments[payment_id]
+    return payment
 
 
 def save_payment_data(payment_id: str, data: Dict[str, Any]):
-    """Guarda los datos de un pago específico."""
-    all_data = load_all_payments()
-    all_data[str(payment_id)] = data
-    save_all_payments(all_data)
+    """
+    Guarda los datos de un pago específico.
+    Actualiza el store en memoria y deja la escritura pendiente para el journal.
+    """
+    global _payments_json_cache
+    _payments_json_cache = None
+    _payment_json_cache.pop(payment_id, None)
+    intern_payment(data)
+    _PAYMENTS[payment_id] = data
+    index_payment(payment_id, data)
+    _pending_writes.append((payment_id, data))
+    _pending_event.set()
 
 
 def save_payment(payment_id: str, amount: float, payment_method: str, status: str):
@@ -86,19 +406,24 @@ class PaymentStrategy(ABC):
 class CreditCardStrategy(PaymentStrategy):
     """
     Strategy para Tarjeta de Crédito.
+    Con use_index=True cuenta los pagos registrados con el índice del store
+    en memoria (all_payments se ignora); si no, recorre all_payments.
     """
 
+    def __init__(self, use_index: bool = False):
+        self.use_index = use_index
+
     def validate(self, amount: float, all_payments: Dict[str, Any]) -> bool:
         # Condición 1: Verifica que el pago sea menor a $10.000
         if amount >= 10000:
             return False
 
         # Condición 2: Valida que no haya más de 1 pago con este medio en estado "REGISTRADO"
-        registered_cc_count = 0
-        for payment in all_payments.values():
-            if (payment[PAYMENT_METHOD] == "Tarjeta de Crédito" and
-                    payment[STATUS] == STATUS_REGISTRADO):
-                registered_cc_count += 1
+        if self.use_index:
+            registered_cc_count = count_registered_in_store(PAYMENT_METHOD_CREDIT_CARD)
+        else:
+            # Alcanza con saber si hay 2, no hace falta contarlos todos
+            registered_cc_count = count_registered(PAYMENT_METHOD_CREDIT_CARD, all_payments, stop_at=2)
 
         # Si hay más de 1 la validación falla.
         # Si hay solo 1 (el que estamos intentando pagar), la validación pasa.
@@ -131,17 +456,21 @@ class DefaultStrategy(PaymentStrategy):
         return False
 
 
+# Las estrategias no tienen estado, así que se instancian una sola vez.
+# Los endpoints validan siempre contra el store en memoria, que está indexado.
+_STRATEGIES: Dict[str, PaymentStrategy] = {
+    PAYMENT_METHOD_CREDIT_CARD: CreditCardStrategy(use_index=True),
+    PAYMENT_METHOD_PAYPAL: PayPalStrategy(),
+}
+# Si el metodo no se reconoce, usamos una estrategia que siempre falla.
+_DEFAULT_STRATEGY = DefaultStrategy()
+
+
 def get_payment_strategy(method: str) -> PaymentStrategy:
     """
     Factory para obtener la estrategia de validación según el método de pago.
     """
-    if method == "Tarjeta de Crédito":
-        return CreditCardStrategy()
-    elif method == "PayPal":
-        return PayPalStrategy()
-    else:
-        # Si el metodo no se reconoce, usamos una estrategia que siempre falla.
-        return DefaultStrategy()
+    return _STRATEGIES.get(method, _DEFAULT_STRATEGY)
 
 
 # Endpoints de la API
@@ -149,17 +478,50 @@ def get_payment_strategy(method: str) -> PaymentStrategy:
 @app.on_event("startup")
 async def startup_event():
     """
-    Al iniciar la aplicación, nos aseguramos que el data.json exista.
+    Al iniciar la aplicación, nos aseguramos que el data.json exista
+    y lo cargamos en memoria.
     """
-    initialize_data_file()
+    global _pending_event, _writer_task, _flush_task
+    open_store()
+    _pending_event = asyncio.Event()
+    _writer_task = asyncio.create_task(journal_writer())
+    _flush_task = asyncio.create_task(flush_journal_periodically())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Al apagar la aplicación, volcamos el store en memoria en data.json.
+    compact() escribe antes las escrituras que seguían pendientes.
+    """
+    _writer_task.cancel()
+    _flush_task.cancel()
+    close_store()
 
 
 @app.get("/payments")
 async def get_payments():
     """
     Endpoint para obtener todos los pagos del sistema.
+    Se serializa una sola vez entre escrituras.
     """
-    return load_all_payments()
+    global _payments_json_cache
+    if _payments_json_cache is None:
+        _payments_json_cache = orjson.dumps(load_all_payments())
+    return Response(content=_payments_json_cache, media_type="application/json")
+
+
+@app.get("/payments/{payment_id}")
+async def get_payment(payment_id: str):
+    """
+    Endpoint para obtener un pago por su ID.
+    Se serializa una sola vez entre escrituras de ese pago.
+    """
+    content = _payment_json_cache.get(payment_id)
+    if content is None:
+        content = orjson.dumps(load_payment(payment_id))
+        _payment_json_cache[payment_id] = content
+    return Response(content=content, media_type="application/json")
 
 
 @app.post("/payments/{payment_id}")
@@ -168,14 +530,9 @@ async def register_payment(payment_id: str, amount: float, payment_method: str):
     Endpoint para registrar un pago con su información.
     El pago se crea en estado "REGISTRADO".
     """
-    try:
-        # Verificamos si el pago ya existe para no sobrescribirlo
-        load_payment(payment_id)
+    # Verificamos si el pago ya existe para no sobrescribirlo
+    if payment_id in load_all_payments():
         raise HTTPException(status_code=400, detail="Payment ID already exists")
-    except HTTPException as e:
-        # Si el error es 404 (no encontrado), podemos crearlo.
-        if e.status_code != 404:
-            raise e
 
     # Guardamos el nuevo pago en estado REGISTRADO
     save_payment(payment_id, amount, payment_method, STATUS_REGISTRADO)
@@ -209,15 +566,17 @@ async def pay_payment(payment_id: str):
     Endpoint para marcar un pago como pagado.
     Acá se ejecuta la lógica de validación (Strategy).
     """
-    payment = load_payment(payment_id)
+    # Una sola carga: se usa para buscar el pago y para la validación
+    all_payments = load_all_payments()
+    payment = all_payments.get(payment_id)
+    if payment is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
 
     # Solo podemos pagar algo que esté registrado
     if payment[STATUS] != STATUS_REGISTRADO:
         raise HTTPException(status_code=400,
                             detail=f"Payment cannot be paid from status {payment[STATUS]}")
 
-    all_payments = load_all_payments()
-
     # Usamos el Patrón Strategy
     # Obtenemos la estrategia correspondiente
     strategy = get_payment_strategy(payment[PAYMENT_METHOD])
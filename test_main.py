@@ -1,4 +1,13 @@
 #Importacion de clases
+import asyncio
+import contextlib
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
 from main import (
     CreditCardStrategy, 
     PayPalStrategy, 
@@ -54,4 +63,342 @@ def test_credit_card_strategy_invalid_multiple_registered():
 
     is_valid = strategy.validate(amount=1000, all_payments=mock_all_payments)
 
-    assert is_valid == False
\ No newline at end of file
+    assert is_valid == False
+
+
+@pytest.fixture
+def data_files(tmp_path, monkeypatch):
+    """
+    Redirige data.json y el journal a un directorio temporal.
+    """
+    data_path = tmp_path / "data.json"
+    journal_path = tmp_path / "data.jsonl"
+    monkeypatch.setattr(main, "DATA_PATH", str(data_path))
+    monkeypatch.setattr(main, "JOURNAL_PATH", str(journal_path))
+    return data_path, journal_path
+
+
+def wait_until(condition, timeout=2.0):
+    """
+    Espera a que se cumpla la condición; las escrituras al journal son asíncronas.
+    """
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timeout esperando la condición"
+        time.sleep(0.01)
+
+
+def journal_ids(journal_path):
+    """Retorna los IDs de las líneas completas que hay en el journal."""
+    if not journal_path.exists():
+        return []
+    return [json.loads(line)["id"]
+            for line in journal_path.read_bytes().splitlines(keepends=True)
+            if line.endswith(b"\n")]
+
+
+@contextlib.contextmanager
+def crashing_client():
+    """
+    TestClient cuyo apagado cierra el journal sin compactar, como si el
+    proceso se hubiera cortado después del último fsync.
+    """
+    def crash():
+        main._journal.close()
+        main._journal = None
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "close_store", crash)
+        with TestClient(main.app) as client:
+            yield client
+
+
+#Cuarto testeo: persistencia con journal
+def test_payments_survive_restart(data_files):
+    """
+    Prueba que data.json no se reescriba en cada request y que los pagos
+    se recuperen al reiniciar.
+    """
+    data_path, _ = data_files
+
+    with TestClient(main.app) as client:
+        client.post("/payments/pago-1", params={"amount": 100, "payment_method": "PayPal"})
+        assert json.loads(data_path.read_text()) == {}
+
+    with TestClient(main.app) as client:
+        payments = client.get("/payments").json()
+
+    assert payments["pago-1"][STATUS] == STATUS_REGISTRADO
+
+
+#Quinto testeo: journal pendiente al iniciar
+def test_journal_replayed_on_startup(data_files):
+    """
+    Prueba que al iniciar se reapliquen las escrituras que quedaron en el journal.
+    """
+    data_path, journal_path = data_files
+    data_path.write_text(json.dumps({"pago-1": {"amount": 100, PAYMENT_METHOD: "PayPal", STATUS: "FALLIDO"}}))
+    journal_path.write_text(
+        json.dumps({"id": "pago-1", "data": {"amount": 100, PAYMENT_METHOD: "PayPal", STATUS: STATUS_REGISTRADO}})
+        + "\n" + '{"id": "pago-2", "da'
+    )
+
+    with TestClient(main.app) as client:
+        payments = client.get("/payments").json()
+
+    assert payments == {"pago-1": {"amount": 100, PAYMENT_METHOD: "PayPal", STATUS: STATUS_REGISTRADO}}
+
+
+#Sexto testeo: journal con una línea incompleta
+def test_torn_journal_is_compacted_on_startup(data_files):
+    """
+    Prueba que si el journal solo tiene una línea incompleta, las escrituras
+    nuevas no queden pegadas a ella y se recuperen luego de un corte.
+    """
+    _, journal_path = data_files
+    journal_path.write_text('{"id": "torn", "da')
+
+    with crashing_client() as client:
+        client.post("/payments/pago-1", params={"amount": 100, "payment_method": "PayPal"})
+        wait_until(lambda: journal_ids(journal_path) == ["pago-1"])
+
+    with TestClient(main.app) as client:
+        payments = client.get("/payments").json()
+
+    assert list(payments) == ["pago-1"]
+
+
+#Séptimo testeo: fsync solo con escrituras pendientes
+def test_idle_journal_is_not_fsynced(data_files):
+    """
+    Prueba que el flush periódico no haga fsync si no hubo escrituras.
+    """
+    fsyncs = []
+    with TestClient(main.app) as client, pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main.os, "fsync", fsyncs.append)
+        time.sleep(main.JOURNAL_FLUSH_INTERVAL * 3)
+        assert fsyncs == []
+
+        client.post("/payments/pago-1", params={"amount": 100, "payment_method": "PayPal"})
+        wait_until(lambda: len(fsyncs) == 1)
+
+
+#Octavo testeo: errores de disco en la tarea escritora
+def test_writer_survives_disk_errors(data_files, monkeypatch):
+    """
+    Prueba que si falla la escritura a disco la tarea escritora siga viva y,
+    cuando el disco vuelve a responder, persista todos los pagos.
+    """
+    data_path, _ = data_files
+    monkeypatch.setattr(main, "COMPACT_EVERY", 1)
+    monkeypatch.setattr(main, "JOURNAL_RETRY_INTERVAL", 0.01)
+
+    with TestClient(main.app) as client:
+        with pytest.MonkeyPatch.context() as mp:
+            def disk_full(data):
+                raise OSError(28, "No space left on device")
+            mp.setattr(main, "save_all_payments", disk_full)
+
+            for i in range(4):
+                response = client.post(f"/payments/pago-{i}",
+                                       params={"amount": 100, "payment_method": "PayPal"})
+                assert response.status_code == 200
+            time.sleep(0.1)
+            assert not main._writer_task.done()
+
+        wait_until(lambda: len(json.loads(data_path.read_text())) == 4)
+
+
+#Noveno testeo: escrituras agrupadas en lotes
+def test_writer_batches_queued_writes(data_files, monkeypatch):
+    """
+    Prueba que las escrituras pendientes juntas se agreguen al journal en un solo lote.
+    """
+    _, journal_path = data_files
+    batch_sizes = []
+    write_journal_batch = main.write_journal_batch
+
+    def spy():
+        batch_sizes.append(len(main._pending_writes))
+        write_journal_batch()
+
+    monkeypatch.setattr(main, "write_journal_batch", spy)
+
+    async def run():
+        main.open_store()
+        monkeypatch.setattr(main, "_pending_event", asyncio.Event())
+        for i in range(5):
+            main.save_payment(f"pago-{i}", 100, "PayPal", STATUS_REGISTRADO)
+
+        writer = asyncio.create_task(main.journal_writer())
+        await asyncio.sleep(main.JOURNAL_BATCH_WAIT * 10)
+        writer.cancel()
+        main.flush_journal()
+        ids = journal_ids(journal_path)
+        main.close_store()
+        return ids
+
+    ids = asyncio.run(run())
+
+    assert batch_sizes == [5]
+    assert ids == [f"pago-{i}" for i in range(5)]
+
+
+#Décimo testeo: corte durante la compactación
+def test_crash_during_compaction_keeps_latest_status(data_files, monkeypatch):
+    """
+    Prueba que un corte después de escribir data.json pero antes de truncar
+    el journal no devuelva un pago a un estado anterior.
+    """
+    monkeypatch.setattr(main, "_pending_event", asyncio.Event())
+    main.open_store()
+    main.save_payment("pago-1", 100, "PayPal", STATUS_REGISTRADO)
+    main.write_journal_batch()
+
+    # El pago pasa a PAGADO pero la escritura sigue pendiente al compactar
+    payment = main.load_payment("pago-1")
+    payment[STATUS] = "PAGADO"
+    main.save_payment_data("pago-1", payment)
+
+    class Crash(Exception):
+        pass
+
+    save_all_payments = main.save_all_payments
+
+    def save_then_crash(data):
+        save_all_payments(data)
+        raise Crash()
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(main, "save_all_payments", save_then_crash)
+        with pytest.raises(Crash):
+            main.compact()
+    main._journal.close()
+    main._journal = None
+
+    main.open_store()
+    assert main.load_payment("pago-1")[STATUS] == "PAGADO"
+    main.close_store()
+
+
+#Undécimo testeo: compactación cada COMPACT_EVERY escrituras
+def test_writer_compacts_every_n_writes(data_files, monkeypatch):
+    """
+    Prueba que la tarea escritora compacte cada COMPACT_EVERY escrituras
+    y que data.json + journal alcancen para recuperar todo tras un corte.
+    """
+    data_path, journal_path = data_files
+    monkeypatch.setattr(main, "COMPACT_EVERY", 3)
+    all_ids = {f"pago-{i}" for i in range(7)}
+
+    def snapshot_ids():
+        return set(json.loads(data_path.read_text()))
+
+    with crashing_client() as client:
+        for payment_id in sorted(all_ids):
+            client.post(f"/payments/{payment_id}", params={"amount": 100, "payment_method": "PayPal"})
+        wait_until(lambda: snapshot_ids() | set(journal_ids(journal_path)) == all_ids)
+
+        # Se compactó al menos una vez, y el journal solo tiene lo posterior
+        assert len(snapshot_ids()) >= 3
+        assert len(journal_ids(journal_path)) < 3
+
+    with TestClient(main.app) as client:
+        assert set(client.get("/payments").json()) == all_ids
+
+
+#Duodécimo testeo: índice sin claves vacías
+def test_index_drops_empty_keys(data_files):
+    """
+    Prueba que el índice no guarde claves (medio, estado) sin pagos.
+    """
+    with TestClient(main.app) as client:
+        client.post("/payments/pago-1", params={"amount": 100, "payment_method": "Cheque"})
+        client.post("/payments/pago-1/update", params={"amount": 100, "payment_method": "PayPal"})
+        client.post("/payments/pago-1/pay")
+
+        assert main._BY_METHOD_STATUS == {("PayPal", "PAGADO"): {"pago-1"}}
+
+
+#Decimotercer testeo: Tarjeta de crédito con índice y sin índice
+def test_credit_card_strategy_index_matches_scan(data_files):
+    """
+    Prueba que la estrategia indexada y la que recorre una copia del store
+    den el mismo resultado.
+    """
+    card = {"amount": 100, "payment_method": "Tarjeta de Crédito"}
+
+    with TestClient(main.app) as client:
+        for payment_id in ("tarjeta-1", "tarjeta-2"):
+            client.post(f"/payments/{payment_id}", params=card)
+            snapshot = client.get("/payments").json()
+
+            indexed = CreditCardStrategy(use_index=True).validate(100, main.load_all_payments())
+            scanned = CreditCardStrategy().validate(100, snapshot)
+            assert indexed == scanned
+
+
+#Decimocuarto testeo: Tarjeta de crédito sobre el store en memoria
+def test_credit_card_pay_uses_registered_index(data_files):
+    """
+    Prueba que /pay cuente los pagos REGISTRADOS con tarjeta que hay en el store.
+    """
+    card = {"amount": 100, "payment_method": "Tarjeta de Crédito"}
+
+    with TestClient(main.app) as client:
+        client.post("/payments/tarjeta-1", params=card)
+        assert client.post("/payments/tarjeta-1/pay").json()[STATUS] == "PAGADO"
+
+        client.post("/payments/tarjeta-2", params=card)
+        client.post("/payments/tarjeta-3", params=card)
+        assert client.post("/payments/tarjeta-2/pay").json()[STATUS] == "FALLIDO"
+
+
+#Decimoquinto testeo: ID duplicado
+def test_register_existing_payment_fails(data_files):
+    """
+    Prueba que no se pueda registrar dos veces el mismo ID.
+    """
+    params = {"amount": 100, "payment_method": "PayPal"}
+
+    with TestClient(main.app) as client:
+        assert client.post("/payments/pago-1", params=params).status_code == 200
+        assert client.post("/payments/pago-1", params=params).status_code == 400
+
+
+#Decimosexto testeo: data.json vacío
+def test_empty_data_file_is_initialized(data_files):
+    """
+    Prueba que un data.json vacío se trate como un store sin pagos.
+    """
+    data_path, _ = data_files
+    data_path.write_text("")
+
+    with TestClient(main.app) as client:
+        assert client.get("/payments").json() == {}
+
+
+#Decimoséptimo testeo: GET /payments luego de una escritura
+def test_get_payments_reflects_writes(data_files):
+    """
+    Prueba que la respuesta cacheada de GET /payments se invalide al escribir.
+    """
+    with TestClient(main.app) as client:
+        assert client.get("/payments").json() == {}
+        client.post("/payments/pago-1", params={"amount": 100, "payment_method": "PayPal"})
+        assert list(client.get("/payments").json()) == ["pago-1"]
+
+
+#Decimoctavo testeo: GET /payments/{payment_id}
+def test_get_payment_reflects_writes(data_files):
+    """
+    Prueba que GET de un pago devuelva su estado actual y 404 si no existe.
+    """
+    with TestClient(main.app) as client:
+        assert client.get("/payments/pago-1").status_code == 404
+
+        client.post("/payments/pago-1", params={"amount": 6000, "payment_method": "PayPal"})
+        assert client.get("/payments/pago-1").json()[STATUS] == STATUS_REGISTRADO
+
+        client.post("/payments/pago-1/pay")
+        assert client.get("/payments/pago-1").json()[STATUS] == "FALLIDO"